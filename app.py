@@ -1,12 +1,18 @@
 import base64
+import hashlib
 import io
-import json
-from typing import Dict, List, Optional, Tuple
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+import orjson
 import requests
 import streamlit as st
-from openai import OpenAI
-from PIL import Image
+import urllib3
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 st.set_page_config(page_title="Linear Issue Creator", layout="wide")
 
@@ -17,131 +23,316 @@ try:
     LINEAR_API_KEY = st.secrets["LINEAR_API_KEY"]
     DEFAULT_MODEL = st.secrets.get("OPENAI_MODEL", "gpt-4o")
     LINEAR_TEAM_ID_DEFAULT = st.secrets.get("LINEAR_TEAM_ID")
+    IMAGE_FORMAT = st.secrets.get("OPENAI_IMAGE_FORMAT", "WEBP").upper()
+    # Accepts a TOML boolean or a string such as "true"/"false".
+    LINEAR_PERSISTED_QUERIES = str(
+        st.secrets.get("LINEAR_PERSISTED_QUERIES", False)
+    ).strip().lower() in ("true", "1", "yes")
 except KeyError as e:
     st.error(f"Missing secret: {e}. Please add it to your Streamlit secrets.")
     st.stop()
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 LINEAR_API_URL = "https://api.linear.app/graphql"
+LINEAR_MAX_WORKERS = 8
+PROGRESS_UPDATE_INTERVAL = 0.2  # seconds
+IMAGE_MAX_DIMENSION = 1024
+IMAGE_PASSTHROUGH_MAX_BYTES = 2 * 1024 * 1024
+IMAGE_MAX_WORKERS = 8
+# Pillow save options and MIME type per supported upload format.
+IMAGE_ENCODINGS = {
+    "WEBP": ("image/webp", {"quality": 80, "method": 4}),
+    "JPEG": ("image/jpeg", {"quality": 85}),
+}
+if IMAGE_FORMAT not in IMAGE_ENCODINGS:
+    IMAGE_FORMAT = "JPEG"
+MIN_TEXT_LENGTH = 10
 SYSTEM_PROMPT = (
     "You extract actionable issues from user input (text + screenshots). "
     "Return STRICT JSON only with this schema:\n"
     '{"issues":[{"title":"<short issue title>","description":"<1-3 bullet point summary>"}]}'
 )
 
+# GraphQL documents. Keeping the text fixed gives each a stable persisted-query hash.
+_Q_PROJECTS = "projects(first: 250) { nodes { id name } }"
+_Q_TEAMS = "viewer { teams(first: 100) { nodes { id name } } }"
+_Q_PROJECT_DETAILS = (
+    "project(id: $projectId) { teams(first: 50) { nodes { id name } }"
+    " projectMilestones(first: 100) { nodes { id name } } }"
+)
+_Q_WORKFLOW_STATES = "team(id: $teamId) { states(first: 50) { nodes { id name } } }"
+# Bootstrap documents keyed by (has_project, has_team).
+_Q_BOOTSTRAP = {
+    (False, False): f"query Bootstrap {{ {_Q_PROJECTS} {_Q_TEAMS} }}",
+    (True, False): (
+        "query Bootstrap($projectId: String!) "
+        f"{{ {_Q_PROJECTS} {_Q_TEAMS} {_Q_PROJECT_DETAILS} }}"
+    ),
+    (False, True): (
+        "query Bootstrap($teamId: String!) "
+        f"{{ {_Q_PROJECTS} {_Q_TEAMS} {_Q_WORKFLOW_STATES} }}"
+    ),
+    (True, True): (
+        "query Bootstrap($projectId: String!, $teamId: String!) "
+        f"{{ {_Q_PROJECTS} {_Q_TEAMS} {_Q_PROJECT_DETAILS} {_Q_WORKFLOW_STATES} }}"
+    ),
+}
+_Q_TEAM_STATES = f"query TeamStates($teamId: String!) {{ {_Q_WORKFLOW_STATES} }}"
+_ISSUE_FIELDS = "success issue { id identifier title project { name } }"
+_Q_ISSUE_CREATE = (
+    "mutation IssueCreate($input: IssueCreateInput!) "
+    f"{{ issueCreate(input: $input) {{ {_ISSUE_FIELDS} }} }}"
+)
+# Persisted-query hashes for the fixed documents. Batch mutations vary in size,
+# so they would never be registered and are sent as plain queries.
+_QUERY_HASHES = {
+    query: hashlib.sha256(query.encode("utf-8")).hexdigest()
+    for query in (*_Q_BOOTSTRAP.values(), _Q_TEAM_STATES, _Q_ISSUE_CREATE)
+}
+
+_NAME_AND_ID = itemgetter("name", "id")
+_WORD_RE = re.compile(r"[^\W\d_]{3,}")  # three or more letters, any script
+
 if "generated_issues" not in st.session_state:
     st.session_state.generated_issues = []
+if "todo_state_ids" not in st.session_state:
+    st.session_state.todo_state_ids = {}
+if "shown_linear_errors" not in st.session_state:
+    st.session_state.shown_linear_errors = set()
 
 
 # --- CORE API & DATA FUNCTIONS ---
 
 
+@st.cache_resource(show_spinner=False)
+def get_linear_session() -> requests.Session:
+    """Returns a process-wide session so Linear calls reuse pooled connections."""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+    return session
+
+
+def _post_graphql(payload: Dict) -> Dict:
+    """Posts a GraphQL payload to Linear and returns the decoded response body.
+
+    Error statuses carrying a GraphQL ``errors`` body are returned like any other
+    response so callers can tell from ``data`` whether the operation ran.
+    """
+    # Stream so the body is read once from the socket rather than chunked
+    # and joined again by response.content.
+    with get_linear_session().post(
+        LINEAR_API_URL,
+        data=orjson.dumps(payload),
+        headers={"Authorization": LINEAR_API_KEY, "Content-Type": "application/json"},
+        timeout=30,
+        stream=True,
+    ) as response:
+        body = response.raw.read(decode_content=True)
+        if response.ok:
+            return orjson.loads(body)
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            data = None
+        if isinstance(data, dict) and "errors" in data:
+            return data
+        response.raise_for_status()
+    return orjson.loads(body)
+
+
+class LinearAPIError(Exception):
+    """Raised by linear_graphql_request when called with ``raise_errors``.
+
+    ``executed`` is False when the response shows Linear rejected the document
+    before running it (no "data" key), and True when it may have run or the
+    outcome is unknown (e.g. a timeout).
+    """
+
+    def __init__(self, message: str, executed: bool = True):
+        super().__init__(message)
+        self.executed = executed
+
+
+def _request_failed(message: str, raise_errors: bool, executed: bool = True) -> None:
+    """Raises or displays a failed Linear request, depending on the caller."""
+    if raise_errors:
+        raise LinearAPIError(message, executed)
+    st.error(message)
+
+
 def linear_graphql_request(
-    query: str, variables: Optional[Dict] = None
+    query: str,
+    variables: Optional[Dict] = None,
+    allow_partial: bool = False,
+    raise_errors: bool = False,
+    partial_errors: Optional[List] = None,
 ) -> Optional[Dict]:
-    """Performs a GraphQL request to the Linear API."""
-    headers = {"Authorization": LINEAR_API_KEY, "Content-Type": "application/json"}
+    """Performs a GraphQL request to the Linear API.
+
+    With ``allow_partial``, data is returned alongside errors so callers can
+    inspect which fields succeeded; those errors are shown, or appended to
+    ``partial_errors`` if given. With ``raise_errors``, a failed request
+    raises LinearAPIError instead of showing an error and returning None.
+    """
+    payload = {"query": query, "variables": variables or {}}
     try:
-        response = requests.post(
-            LINEAR_API_URL,
-            json={"query": query, "variables": variables or {}},
-            headers=headers,
-            timeout=30,
+        query_hash = _QUERY_HASHES.get(query)
+        if LINEAR_PERSISTED_QUERIES and query_hash:
+            # Apollo-style persisted query: send only the hash, and the full
+            # text only if the request failed before execution (no "data" key),
+            # e.g. PERSISTED_QUERY_NOT_FOUND. Mutations are never run twice.
+            # Ad-hoc documents (the batch mutation) are always posted in full.
+            extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+            data = _post_graphql(
+                {"variables": payload["variables"], "extensions": extensions}
+            )
+            if "data" not in data:
+                data = _post_graphql({**payload, "extensions": extensions})
+        else:
+            data = _post_graphql(payload)
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        return _request_failed(f"Failed to connect to Linear API: {e}", raise_errors)
+    except orjson.JSONDecodeError as e:
+        return _request_failed(
+            f"Failed to decode Linear API response: {e.doc[:500]}", raise_errors
         )
-        response.raise_for_status()
-        data = response.json()
-        if "errors" in data:
+    if "errors" in data:
+        if not (allow_partial and data.get("data")):
+            # Per the GraphQL spec, "data" is absent only if execution never started.
+            return _request_failed(
+                f"Linear API Error: {data['errors']}",
+                raise_errors,
+                executed="data" in data,
+            )
+        if partial_errors is None:
             st.error(f"Linear API Error: {data['errors']}")
-            return None
-        return data.get("data")
-    except requests.exceptions.RequestException as e:
-        st.error(f"Failed to connect to Linear API: {e}")
-        return None
-    except json.JSONDecodeError:
-        st.error(f"Failed to decode Linear API response: {response.text[:500]}")
-        return None
+        else:
+            partial_errors.extend(data["errors"])
+    return data.get("data")
 
 
-@st.cache_data(ttl=3600)
-def fetch_projects() -> Dict[str, str]:
-    """Fetches all projects and returns a name-to-id mapping."""
-    query = "query { projects(first: 250) { nodes { id name } } }"
-    data = linear_graphql_request(query)
-    return (
-        {p["name"]: p["id"] for p in data["projects"]["nodes"]}
-        if data and "projects" in data
-        else {}
-    )
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    """Creates the OpenAI client on first use, keeping the import off cold start."""
+    from openai import OpenAI
 
+    return OpenAI(api_key=OPENAI_API_KEY)
 
-@st.cache_data(ttl=600)
-def fetch_project_details(project_id: str) -> Dict:
-    """Fetches teams and milestones for a specific project."""
-    query = """
-    query($id: String!) {
-      project(id: $id) {
-        teams(first: 50) { nodes { id name } }
-        projectMilestones(first: 100) { nodes { id name } }
-      }
+
+def _nodes_to_map(connection: Optional[Dict]) -> Dict[str, str]:
+    """Returns a name-to-id mapping for the nodes of a GraphQL connection."""
+    return dict(map(_NAME_AND_ID, (connection or {}).get("nodes") or []))
+
+
+def _bootstrap_maps(data: Dict) -> Dict:
+    """Builds the name-to-id maps returned by fetch_bootstrap from response data."""
+    project = data.get("project") or {}
+    maps = {
+        "projects": _nodes_to_map(data.get("projects")),
+        "teams": _nodes_to_map((data.get("viewer") or {}).get("teams")),
+        "project_teams": _nodes_to_map(project.get("teams")),
+        "milestones": _nodes_to_map(project.get("projectMilestones")),
+        "states": _nodes_to_map((data.get("team") or {}).get("states")),
     }
-    """
-    data = linear_graphql_request(query, {"id": project_id})
-    if not data or "project" not in data:
-        return {"teams": {}, "milestones": {}}
-    project = data["project"]
-    teams = {t["name"]: t["id"] for t in project.get("teams", {}).get("nodes", [])}
-    milestones = {
-        m["name"]: m["id"]
-        for m in project.get("projectMilestones", {}).get("nodes", [])
+    # Sorted once here so cached reruns of the sidebar's selectboxes don't re-sort.
+    maps["sorted_names"] = {
+        key: tuple(sorted(maps[key]))
+        for key in ("projects", "teams", "project_teams", "milestones")
     }
-    return {"teams": teams, "milestones": milestones}
+    return maps
 
 
-@st.cache_data(ttl=3600)
-def fetch_teams() -> Dict[str, str]:
-    """Fetches all teams for the viewer and returns a name-to-id mapping."""
-    query = "query { viewer { teams(first: 100) { nodes { id name } } } }"
-    data = linear_graphql_request(query)
-    return (
-        {t["name"]: t["id"] for t in data["viewer"]["teams"]["nodes"]}
-        if data and "viewer" in data
-        else {}
+# Projects and teams share this query with project details, so they use its
+# 600s ttl rather than the 3600s they had as separate queries.
+@st.cache_data(ttl=600)
+def fetch_bootstrap(
+    project_id: Optional[str] = None, team_id: Optional[str] = None
+) -> Dict:
+    """Fetches projects, teams, and optional project/team details in one request.
+
+    A failing project or team field (e.g. a stale id) still returns the rest,
+    with the GraphQL errors under "errors" so load_bootstrap can show them
+    outside the cache. Raises LinearAPIError if nothing usable came back, so
+    failures aren't cached.
+    """
+    variables = {}
+    if project_id:
+        variables["projectId"] = project_id
+    if team_id:
+        variables["teamId"] = team_id
+    query = _Q_BOOTSTRAP[(bool(project_id), bool(team_id))]
+    errors = []
+    data = linear_graphql_request(
+        query, variables, allow_partial=True, raise_errors=True, partial_errors=errors
     )
+    return {**_bootstrap_maps(data or {}), "errors": errors}
+
+
+def load_bootstrap(
+    project_id: Optional[str] = None, team_id: Optional[str] = None
+) -> Dict:
+    """Returns fetch_bootstrap's result, or empty maps if the request failed.
+
+    Partial errors are shown once per session rather than on every rerun.
+    """
+    try:
+        bootstrap = fetch_bootstrap(project_id, team_id)
+    except LinearAPIError as e:
+        st.error(str(e))
+        return {**_bootstrap_maps({}), "errors": []}
+    if bootstrap["errors"]:
+        message = f"Linear API Error: {bootstrap['errors']}"
+        if message not in st.session_state.shown_linear_errors:
+            st.session_state.shown_linear_errors.add(message)
+            st.error(message)
+    return bootstrap
 
 
 @st.cache_data(ttl=3600)
 def fetch_workflow_states(team_id: str) -> Dict[str, str]:
-    """Fetches all workflow states for a team and returns a name-to-id mapping."""
-    query = """
-    query TeamWorkflowStates($teamId: String!) {
-        team(id: $teamId) {
-            states(first: 50) {
-                nodes { id name }
-            }
-        }
-    }
+    """Fetches a team's workflow states when the bootstrap query didn't cover it.
+
+    Raises LinearAPIError on failure so that failures aren't cached.
     """
-    data = linear_graphql_request(query, {"teamId": team_id})
-    if data and "team" in data:
-        return {s["name"]: s["id"] for s in data["team"]["states"]["nodes"]}
-    return {}
+    data = linear_graphql_request(
+        _Q_TEAM_STATES, {"teamId": team_id}, raise_errors=True
+    )
+    return _nodes_to_map(((data or {}).get("team") or {}).get("states"))
 
 
-def create_linear_issue(**kwargs) -> Optional[Dict]:
+def build_issue_input(
+    team_id: str,
+    title: str,
+    description: Optional[str] = None,
+    project_id: Optional[str] = None,
+    milestone_id: Optional[str] = None,
+    state_id: Optional[str] = None,
+) -> Dict:
+    """Builds an IssueCreateInput payload, omitting unset properties."""
+    input_payload = {"teamId": team_id, "title": title[:255]}
+    if description is not None:
+        input_payload["description"] = description
+    if project_id is not None:
+        input_payload["projectId"] = project_id
+    if milestone_id is not None:
+        input_payload["projectMilestoneId"] = milestone_id
+    if state_id is not None:
+        input_payload["stateId"] = state_id
+    return input_payload
+
+
+def create_linear_issue(
+    team_id: str,
+    title: str,
+    description: Optional[str] = None,
+    project_id: Optional[str] = None,
+    milestone_id: Optional[str] = None,
+    state_id: Optional[str] = None,
+) -> Optional[Dict]:
     """Creates a new issue in Linear with the given properties."""
-    mutation = """
-    mutation IssueCreate($input: IssueCreateInput!) {
-      issueCreate(input: $input) {
-        success
-        issue { id identifier title project { name } }
-      }
-    }
-    """
-    input_payload = {k: v for k, v in kwargs.items() if v is not None}
-    if "title" in input_payload:
-        input_payload["title"] = input_payload["title"][:255]
-    data = linear_graphql_request(mutation, {"input": input_payload})
+    input_payload = build_issue_input(
+        team_id, title, description, project_id, milestone_id, state_id
+    )
+    data = linear_graphql_request(_Q_ISSUE_CREATE, {"input": input_payload})
     return (
         data["issueCreate"]["issue"]
         if data and data.get("issueCreate", {}).get("success")
@@ -149,44 +340,175 @@ def create_linear_issue(**kwargs) -> Optional[Dict]:
     )
 
 
-def extract_issues_with_gpt(user_text: str, image_data_urls: List[str]) -> List[Dict]:
-    """Uses GPT to extract structured issue data from text and images."""
+def create_linear_issues(inputs: List[Dict]) -> Optional[List[Optional[Dict]]]:
+    """Creates several issues with one aliased mutation.
+
+    Returns one entry per input (None where that issue failed). If Linear
+    rejected the whole mutation unrun, every entry is None so each issue can be
+    retried. Returns None if the mutation may have partly run without telling us
+    which issues were created: a timeout, or ``data: null`` because one
+    non-null ``issueCreate`` field failed and aborted the rest.
+    """
+    params = ", ".join(f"$i{n}: IssueCreateInput!" for n in range(len(inputs)))
+    fields = " ".join(
+        f"m{n}: issueCreate(input: $i{n}) {{ {_ISSUE_FIELDS} }}"
+        for n in range(len(inputs))
+    )
+    mutation = f"mutation IssueCreateBatch({params}) {{ {fields} }}"
+    variables = {f"i{n}": payload for n, payload in enumerate(inputs)}
+    try:
+        data = linear_graphql_request(
+            mutation, variables, allow_partial=True, raise_errors=True
+        )
+    except LinearAPIError as e:
+        st.error(str(e))
+        return None if e.executed else [None] * len(inputs)
+    if data is None:
+        return None
+    results = []
+    for n in range(len(inputs)):
+        result = data.get(f"m{n}") or {}
+        results.append(result.get("issue") if result.get("success") else None)
+    return results
+
+
+def _iter_stream_text(stream, parts: List[str]) -> Iterator[str]:
+    """Yields the text deltas of a streamed completion, collecting them in parts."""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+
+
+def _iter_issue_objects(chunks: Iterable[str]) -> Iterator[Dict]:
+    """Yields each object of a streamed {"issues": [...]} document once it closes.
+
+    Only objects directly inside the root "issues" array are yielded.
+    """
+    depth, in_string, escaped = 0, False, False
+    # The last string seen in the root object; a key always precedes its value.
+    root_string: List[str] = []
+    last_root_string, in_issues = None, False
+    current: List[str] = []
+    for chunk in chunks:
+        for char in chunk:
+            closed = False
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                    if depth == 1:
+                        last_root_string = "".join(root_string)
+                if in_string and depth == 1:
+                    root_string.append(char)
+            elif char == '"':
+                in_string = True
+                root_string = []
+            elif char in "{[":
+                depth += 1
+                if depth == 2:
+                    in_issues = char == "[" and last_root_string == "issues"
+            elif char in "}]":
+                depth -= 1
+                closed = depth == 2 and in_issues
+            # Depth 1 is the root object, 2 the issues array, 3 a single issue.
+            if in_issues and (depth >= 3 or closed):
+                current.append(char)
+            if closed:
+                try:
+                    issue = orjson.loads("".join(current))
+                except orjson.JSONDecodeError:
+                    issue = None
+                if isinstance(issue, dict):
+                    yield issue
+                current = []
+
+
+def has_actionable_text(user_text: str) -> bool:
+    """Returns True if the text is long enough to describe at least one issue."""
+    text = (user_text or "").strip()
+    return len(text) >= MIN_TEXT_LENGTH and bool(_WORD_RE.search(text))
+
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def extract_issues_with_gpt(user_text: str, image_digests: Tuple[str, ...]) -> List[Dict]:
+    """Uses GPT to extract structured issue data from text and images.
+
+    Images are passed as SHA-256 digests to keep the cache key small; their data
+    URLs are looked up in ``st.session_state.image_data_urls``. Errors are raised
+    rather than returned so that failed calls are not cached.
+    """
     content = [{"type": "text", "text": user_text or "No text provided."}]
-    for url in image_data_urls:
+    for digest in image_digests:
+        url = st.session_state.image_data_urls[digest]
         content.append({"type": "image_url", "image_url": {"url": url}})
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": content},
     ]
+    stream = get_openai_client().chat.completions.create(
+        model=DEFAULT_MODEL,
+        messages=messages,
+        response_format={"type": "json_object"},
+        stream=True,
+    )
+    # Show titles as soon as each issue object closes in the stream.
+    parts: List[str] = []
+    preview = st.empty()
+    titles = []
     try:
-        response = openai_client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=messages,
-            response_format={"type": "json_object"},
-        )
-        raw_content = response.choices[0].message.content
-        data = json.loads(raw_content or "{}")
-        issues = data.get("issues", [])
-    except (json.JSONDecodeError, Exception) as e:
-        st.warning(f"Could not parse AI response as JSON. Error: {e}")
-        return []
+        for issue in _iter_issue_objects(_iter_stream_text(stream, parts)):
+            title = (issue.get("title") or "").strip()
+            if title:
+                titles.append(title)
+                preview.markdown("\n".join(f"- {t}" for t in titles))
+    finally:
+        preview.empty()
+    data = orjson.loads("".join(parts) or "{}")
     return [
         {
             "title": (i.get("title") or "").strip(),
             "description": (i.get("description") or "").strip(),
         }
-        for i in issues
+        for i in data.get("issues", [])
         if (i.get("title") or "").strip()
     ]
 
 
+def _to_data_url(mime_type: str, buffer: io.BytesIO) -> str:
+    """Base64-encodes a buffer's contents into a data URL without copying them."""
+    with buffer.getbuffer() as view:
+        b64_str = base64.b64encode(view).decode("ascii")
+    return f"data:{mime_type};base64,{b64_str}"
+
+
 def image_to_data_url(file) -> str:
     """Converts an uploaded image file to a base64 data URL."""
-    img = Image.open(file).convert("RGB")
+    # Imported lazily: Pillow is only needed once a screenshot is uploaded.
+    from PIL import Image, features
+
+    img = Image.open(file)
+    if (
+        img.format == "JPEG"
+        and file.size <= IMAGE_PASSTHROUGH_MAX_BYTES
+        and max(img.size) <= IMAGE_MAX_DIMENSION
+    ):
+        # Already a modest JPEG: send the original bytes without re-encoding.
+        return _to_data_url("image/jpeg", file)
+    # Lets the JPEG decoder downscale while decoding instead of after.
+    img.draft("RGB", (IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+    img = img.convert("RGB")
+    img.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.Resampling.LANCZOS)
+    image_format = IMAGE_FORMAT
+    if image_format == "WEBP" and not features.check("webp"):
+        image_format = "JPEG"
+    mime_type, save_options = IMAGE_ENCODINGS[image_format]
     buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=85)
-    b64_str = base64.b64encode(buf.getvalue()).decode("utf-8")
-    return f"data:image/jpeg;base64,{b64_str}"
+    img.save(buf, format=image_format, **save_options)
+    return _to_data_url(mime_type, buf)
 
 
 # --- UI RENDERING & WORKFLOW FUNCTIONS ---
@@ -195,18 +517,21 @@ def image_to_data_url(file) -> str:
 def render_sidebar() -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """Renders the sidebar selectors for project, milestone, and team."""
     st.sidebar.header("Assignment Options")
-    projects_map = fetch_projects()
-    project_names = ["None"] + sorted(projects_map.keys())
+    # Reuse the previous run's selection so a single request covers the page.
+    hint_project_id = st.session_state.get("selected_project_id")
+    hint_team_id = st.session_state.get("selected_team_id", LINEAR_TEAM_ID_DEFAULT)
+    bootstrap = load_bootstrap(hint_project_id, hint_team_id)
+    projects_map = bootstrap["projects"]
+    project_names = ["None", *bootstrap["sorted_names"]["projects"]]
     project_choice = st.sidebar.selectbox("Project", project_names)
     selected_project_id = projects_map.get(project_choice)
 
-    project_teams_map, milestones_map = {}, {}
-    if selected_project_id:
-        details = fetch_project_details(selected_project_id)
-        project_teams_map = details.get("teams", {})
-        milestones_map = details.get("milestones", {})
+    if selected_project_id != hint_project_id:
+        bootstrap = load_bootstrap(selected_project_id, hint_team_id)
+    project_teams_map = bootstrap["project_teams"]
+    milestones_map = bootstrap["milestones"]
 
-    milestone_names = ["None"] + sorted(milestones_map.keys())
+    milestone_names = ["None", *bootstrap["sorted_names"]["milestones"]]
     milestone_choice = st.sidebar.selectbox(
         "Milestone", milestone_names, disabled=not selected_project_id
     )
@@ -219,15 +544,15 @@ def render_sidebar() -> Tuple[Optional[str], Optional[str], Optional[str]]:
         st.sidebar.info(f"Auto-selected team: {team_name}")
     elif selected_project_id and len(project_teams_map) > 1:
         team_choice = st.sidebar.selectbox(
-            "Team (from project)", sorted(project_teams_map.keys())
+            "Team (from project)", bootstrap["sorted_names"]["project_teams"]
         )
         team_id_to_use = project_teams_map.get(team_choice)
     else:
         if selected_project_id:
             st.sidebar.warning("Project has no teams. Select a team below.")
-        all_teams_map = fetch_teams()
+        all_teams_map = bootstrap["teams"]
         if all_teams_map:
-            team_names = sorted(all_teams_map.keys())
+            team_names = bootstrap["sorted_names"]["teams"]
             default_index = 0
             if LINEAR_TEAM_ID_DEFAULT:
                 try:
@@ -244,6 +569,13 @@ def render_sidebar() -> Tuple[Optional[str], Optional[str], Optional[str]]:
 
     if not team_id_to_use:
         st.sidebar.error("A team is required to create issues.")
+    if team_id_to_use and team_id_to_use == hint_team_id:
+        # The bootstrap already carried this team's states; main() reads them here.
+        todo_state_id = bootstrap["states"].get("Todo")
+        if todo_state_id:
+            st.session_state.todo_state_ids[team_id_to_use] = todo_state_id
+    st.session_state.selected_project_id = selected_project_id
+    st.session_state.selected_team_id = team_id_to_use
     return selected_project_id, selected_milestone_id, team_id_to_use
 
 
@@ -259,58 +591,114 @@ def render_editor_and_creator(
         "Edit the generated titles and descriptions, or mark issues for deletion before creating them in Linear."
     )
 
-    with st.form("edit_issues_form"):
-        for i, issue in enumerate(st.session_state.generated_issues):
-            st.divider()
-            col1, col2 = st.columns([10, 1])
-            with col1:
-                issue["title"] = st.text_input(
-                    "Title", value=issue["title"], key=f"title_{i}"
-                )
-            with col2:
-                issue["delete"] = st.checkbox(
-                    "Delete", key=f"delete_{i}", help="Mark this issue for deletion"
-                )
+    # Imported lazily: pandas is only needed once issues have been generated.
+    import pandas as pd
 
-            issue["description"] = st.text_area(
-                "Description", value=issue["description"], key=f"desc_{i}", height=100
-            )
+    issues_df = pd.DataFrame(
+        st.session_state.generated_issues, columns=["title", "description"]
+    )
+    issues_df["delete"] = False
+
+    with st.form("edit_issues_form"):
+        # A single grid widget instead of three widgets per issue.
+        edited_df = st.data_editor(
+            issues_df,
+            num_rows="fixed",
+            hide_index=True,
+            column_config={
+                "title": st.column_config.TextColumn(
+                    "Title", required=True, max_chars=255
+                ),
+                "description": st.column_config.TextColumn(
+                    "Description", width="large"
+                ),
+                "delete": st.column_config.CheckboxColumn(
+                    "Delete", help="Mark this issue for deletion"
+                ),
+            },
+        )
 
         submitted = st.form_submit_button("Create Issues in Linear", type="primary")
 
         if submitted:
             issues_to_submit = [
-                iss
-                for iss in st.session_state.generated_issues
-                if not iss.get("delete")
+                {"title": row.title.strip(), "description": row.description or None}
+                for row in edited_df.itertuples(index=False)
+                if not row.delete and (row.title or "").strip()
             ]
             if not issues_to_submit:
                 st.warning("No issues were selected for creation.")
                 return
 
+            issue_args = [
+                (
+                    team_id,
+                    issue["title"],
+                    issue.get("description"),
+                    project_id,
+                    milestone_id,
+                    state_id,  # Assigns the "Todo" status
+                )
+                for issue in issues_to_submit
+            ]
+            inputs = [build_issue_input(*args) for args in issue_args]
             progress_bar = st.progress(0, "Creating issues...")
+            results = create_linear_issues(inputs)
+            outcome_unknown = results is None
+            if outcome_unknown:
+                # The batch may have been partly applied, so retrying could duplicate issues.
+                results = [None] * len(inputs)
+                retry = []
+            else:
+                retry = [n for n, created in enumerate(results) if created is None]
+            progress_bar.progress(1 - len(retry) / len(inputs))
+
+            if retry:
+                # Worker threads inherit the script context so st.error calls still render.
+                with ThreadPoolExecutor(
+                    max_workers=min(LINEAR_MAX_WORKERS, len(retry)),
+                    initializer=add_script_run_ctx,
+                    initargs=(None, get_script_run_ctx()),
+                ) as executor:
+                    futures = {
+                        executor.submit(create_linear_issue, *issue_args[n]): n
+                        for n in retry
+                    }
+                    # Throttle UI writes; each one is a websocket frame.
+                    last_update = time.monotonic()
+                    for i, future in enumerate(as_completed(futures), start=1):
+                        results[futures[future]] = future.result()
+                        now = time.monotonic()
+                        if now - last_update >= PROGRESS_UPDATE_INTERVAL:
+                            progress_bar.progress(
+                                (len(inputs) - len(retry) + i) / len(inputs)
+                            )
+                            last_update = now
+                progress_bar.progress(1.0)
+
             created_count = 0
-            for i, issue in enumerate(issues_to_submit):
-                created = create_linear_issue(
-                    teamId=team_id,
-                    title=issue["title"],
-                    description=issue.get("description"),
-                    projectId=project_id,
-                    projectMilestoneId=milestone_id,
-                    stateId=state_id,  # Assigns the "Todo" status
-                )
+            lines = []
+            for issue, created in zip(issues_to_submit, results):
                 if created:
                     created_count += 1
                     proj = created.get("project", {}).get("name")
                     details = f" (Project: {proj})" if proj else ""
-                    st.write(
+                    lines.append(
                         f"Success: {created['identifier']} - {created['title']}{details}"
                     )
+                elif outcome_unknown:
+                    lines.append(f"May have been created: {issue['title']}")
                 else:
-                    st.write(f"Failed to create: {issue['title']}")
-
-                progress_bar.progress((i + 1) / len(issues_to_submit))
-
+                    lines.append(f"Failed to create: {issue['title']}")
+            st.write("\n\n".join(lines))
+
+            if outcome_unknown:
+                # Keep the issues so the user can retry after checking Linear.
+                st.warning(
+                    "The outcome of the request is unknown. Some of these issues may "
+                    "have been created; check Linear before creating them again."
+                )
+                return
             st.success(
                 f"Process Complete. Created {created_count} of {len(issues_to_submit)} issues."
             )
@@ -329,8 +717,15 @@ def main():
     # Fetch the state ID for "Todo" for the selected team
     todo_state_id = None
     if team_id:
-        workflow_states = fetch_workflow_states(team_id)
-        todo_state_id = workflow_states.get("Todo")
+        todo_state_id = st.session_state.todo_state_ids.get(team_id)
+        if not todo_state_id:
+            # Only reached when the sidebar's bootstrap didn't include this team.
+            try:
+                todo_state_id = fetch_workflow_states(team_id).get("Todo")
+            except LinearAPIError as e:
+                st.error(str(e))
+            if todo_state_id:
+                st.session_state.todo_state_ids[team_id] = todo_state_id
         if not todo_state_id:
             st.sidebar.warning(
                 "Could not find 'Todo' state for this team. Issues will be created with the default status."
@@ -349,15 +744,41 @@ def main():
     )
 
     if st.button("Generate Issues", type="secondary", disabled=not team_id):
-        if not user_text and not uploaded_files:
-            st.warning("Please enter a description or upload a file.")
+        if not uploaded_files and not has_actionable_text(user_text):
+            st.warning("Please enter a longer description or upload a file.")
             return
 
         with st.spinner("Analyzing input..."):
-            img_urls = [image_to_data_url(f) for f in uploaded_files or []]
-            st.session_state.generated_issues = extract_issues_with_gpt(
-                user_text, img_urls
-            )
+            img_urls = []
+            if uploaded_files:
+                # PIL releases the GIL while decoding/encoding, so threads run in parallel.
+                with ThreadPoolExecutor(
+                    max_workers=min(IMAGE_MAX_WORKERS, len(uploaded_files))
+                ) as executor:
+                    img_urls = list(executor.map(image_to_data_url, uploaded_files))
+            st.session_state.image_data_urls = {
+                hashlib.sha256(url.encode("ascii")).hexdigest(): url
+                for url in img_urls
+            }
+            # Imported here, like the client itself, to keep openai off cold start.
+            from openai import OpenAIError
+
+            try:
+                st.session_state.generated_issues = extract_issues_with_gpt(
+                    user_text, tuple(st.session_state.image_data_urls)
+                )
+            except orjson.JSONDecodeError as e:
+                st.warning(f"Could not parse AI response as JSON. Error: {e}")
+                st.session_state.generated_issues = []
+            except OpenAIError as e:
+                st.warning(f"OpenAI request failed: {e}")
+                st.session_state.generated_issues = []
+            except Exception as e:
+                st.warning(f"Could not extract issues: {e}")
+                st.session_state.generated_issues = []
+            finally:
+                # Only needed for the call itself; don't keep images in the session.
+                st.session_state.pop("image_data_urls", None)
 
         if not st.session_state.generated_issues:
             st.warning("No actionable issues could be extracted from the input.")